@@ -1,17 +1,30 @@
-from flask import Flask, request, jsonify
+# Patch blocking stdlib I/O before anything else imports it, so the app also
+# runs cooperatively when gunicorn preloads it ahead of the gevent workers
+from gevent import monkey
+
+monkey.patch_all()
+
+from flask import Flask, Response, g, request
+from flask.json.provider import JSONProvider
 from pathlib import Path
-from processor import process_statement
-from models.api_models import StatementRequest, StatementResponse, HealthResponse
-from typing import Dict, Tuple, Any, Generator
-from functools import wraps
+from processor import process_statement, warmup
+from models.api_models import StatementRequest, HealthResponse
+from constants import SUBJECT, SUBJECT_HEADER, STREAM_CHUNK_SIZE, UTF8_BOM
+from typing import Any, Generator, BinaryIO, Optional, Union
+from functools import lru_cache, wraps
 from pydantic_settings import BaseSettings
 import tempfile
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import date, datetime, timezone
 from pydantic import ValidationError
 import logging
+import os
 import signal
 import atexit
+import orjson
+import re
+import time
+import uuid
 
 
 class Settings(BaseSettings):
@@ -19,15 +32,44 @@ class Settings(BaseSettings):
     PORT: int = 5000
     SERVICE_NAME: str = "ibkr-processor"
     LOG_LEVEL: str = "INFO"
+    MAX_CONTENT_LENGTH: int = 50 * 1024 * 1024
+    # tmpfs keeps streamed uploads in RAM instead of the container overlay
+    TMP_DIR: str = (
+        "/dev/shm/ibkr" if Path("/dev/shm").is_dir() else tempfile.gettempdir()
+    )
 
     class Config:
         env_file = ".env"
 
 
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+
 settings = Settings()
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.config["MAX_CONTENT_LENGTH"] = settings.MAX_CONTENT_LENGTH
+TMP_DIR = Path(settings.TMP_DIR)
+TMP_DIR.mkdir(parents=True, exist_ok=True)
 logger = logging.getLogger(__name__)
 
+# Pydantic builds the validator once per model, keep the bound method and
+# the constant part of the success body around instead of rebuilding them
+_VALIDATE_STATEMENT_REQUEST = StatementRequest.model_validate_json
+# Subjects end with the statement date as MM/DD/YYYY
+_SUBJECT_DATE_RE = re.compile(r"(?:^|\s)(\d{1,2})/(\d{1,2})/(\d{4})\s*$")
+_SUCCESS_PREFIX = (
+    b'{"status":"success","message":"Statement processed successfully",'
+    b'"error":null,"data":'
+)
+
 
 def setup_logging():
     """Configure application logging"""
@@ -37,31 +79,83 @@ def setup_logging():
     )
 
 
-def create_error_response(message: str, status_code: int) -> Tuple[Dict[str, Any], int]:
+setup_logging()
+# With gunicorn --preload this runs once in the master, workers inherit it
+warmup()
+
+
+@app.before_request
+def assign_request_context() -> None:
+    """Stamp each request with an id and receive time, read by all helpers"""
+    g.request_id = uuid.uuid4().hex
+    g.ts = time.time()
+
+
+def request_timestamp() -> datetime:
+    """Receive time of the current request as an aware UTC datetime"""
+    return datetime.fromtimestamp(g.ts, tz=timezone.utc)
+
+
+def create_error_response(message: str, status_code: int) -> Response:
     """Create standardized error response"""
-    return (
-        jsonify(
+    return Response(
+        orjson.dumps(
             {
                 "error": message,
-                "timestamp": datetime.utcnow(),
+                "request_id": g.request_id,
+                "timestamp": request_timestamp(),
             }
         ),
-        status_code,
+        status=status_code,
+        mimetype="application/json",
     )
 
 
+def csv_bytes(content: str) -> bytes:
+    """Encode CSV content for the processor, dropping a leading BOM"""
+    return content.removeprefix("\ufeff").encode()
+
+
+def write_all(fd: int, data: bytes) -> int:
+    """Write data to a raw file descriptor, retrying on partial writes"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+    return len(data)
+
+
+class UploadStorageError(Exception):
+    """The streamed request body could not be written to TMP_DIR"""
+
+
 @contextmanager
-def temp_csv_file(content: str, date_str: str) -> Generator[Path, None, None]:
-    """Create temporary CSV file and cleanup after use"""
+def streamed_csv_file(
+    stream: BinaryIO, date_str: str, content_length: Optional[int] = None
+) -> Generator[Path, None, None]:
+    """
+    Stream request body into a temporary CSV file, valid while the context is
+    open. The file is removed when it is closed, however the context exits.
+    """
     with tempfile.NamedTemporaryFile(
-        suffix=f".{date_str}.csv", mode="w", encoding="utf-8", delete=False
+        suffix=f".{date_str}.csv", mode="wb", dir=TMP_DIR, delete=True
     ) as tmp_file:
+        fd = tmp_file.fileno()
         try:
-            tmp_file.write(content.replace("\ufeff", ""))
-            tmp_file.flush()
-            yield Path(tmp_file.name)
-        finally:
-            Path(tmp_file.name).unlink(missing_ok=True)
+            if content_length and hasattr(os, "posix_fallocate"):
+                # Reserve the whole file up front so the FS allocates it in one go
+                os.posix_fallocate(fd, 0, content_length)
+            written = 0
+            first_chunk = True
+            while chunk := stream.read(STREAM_CHUNK_SIZE):
+                if first_chunk:
+                    chunk = chunk.removeprefix(UTF8_BOM)
+                    first_chunk = False
+                written += write_all(fd, chunk)
+            # Drop the preallocated tail left by a stripped BOM or a short body
+            os.ftruncate(fd, written)
+        except OSError as e:
+            raise UploadStorageError(f"Could not store the upload: {e}") from e
+        yield Path(tmp_file.name)
 
 
 def check_dependencies() -> bool:
@@ -69,52 +163,46 @@ def check_dependencies() -> bool:
     try:
         return True
     except Exception as e:
-        logger.error(f"Dependency check failed: {str(e)}")
+        logger.error("Dependency check failed: %s", e)
         return False
 
 
+@lru_cache(maxsize=1024)
 def parse_date_from_subject(subject: str) -> str:
-    """Parse date from email subject"""
+    """Parse date from email subject, cached since replays resend the same subjects"""
+    match = _SUBJECT_DATE_RE.search(subject)
     try:
-        date_str = subject.split(" ")[-1].strip()
-        parsed_date = datetime.strptime(date_str, "%m/%d/%Y")
-        return parsed_date.strftime("%Y%m%d")
-    except (ValueError, IndexError) as e:
-        logger.error(f"Failed to parse date from subject: {subject}")
+        if match is None:
+            raise ValueError("no trailing MM/DD/YYYY date")
+        month, day, year = map(int, match.groups())
+        # Only used to reject impossible dates such as 02/30/2025
+        date(year, month, day)
+    except ValueError as e:
+        logger.error("Failed to parse date from subject: %s", subject)
         raise ValueError(
             f"Invalid date format in subject. Expected MM/DD/YYYY, got: {subject}"
         ) from e
+    return f"{year:04d}{month:02d}{day:02d}"
 
 
 def handle_statement_processing(
-    data: StatementRequest, result: Any
-) -> Tuple[dict, int]:
+    input_file: Union[str, bytes], date_str: str
+) -> Response:
     """Process statement and handle any errors"""
     try:
-        return (
-            StatementResponse(
-                status="success",
-                message="Statement processed successfully",
-                data=result,
-            ).model_dump(),
-            200,
+        result = process_statement(input_file, input_date=date_str)
+        body = (
+            _SUCCESS_PREFIX
+            + orjson.dumps(result.metrics, option=orjson.OPT_SERIALIZE_NUMPY)
+            + b"}"
         )
+        return Response(body, status=200, mimetype="application/json")
     except ValueError as ve:
-        logger.error(f"Validation error: {str(ve)}")
-        return (
-            StatementResponse(
-                status="error", message="Validation error", error=str(ve)
-            ).model_dump(),
-            400,
-        )
+        logger.error("Validation error for request %s: %s", g.request_id, ve)
+        return create_error_response(str(ve), 400)
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return (
-            StatementResponse(
-                status="error", message="Internal server error", error=str(e)
-            ).model_dump(),
-            500,
-        )
+        logger.exception("Unexpected error for request %s: %s", g.request_id, e)
+        return create_error_response("Internal server error", 500)
 
 
 def validate_json_request(f):
@@ -129,17 +217,40 @@ def validate_json_request(f):
     return decorated_function
 
 
+def validate_csv_request(f):
+    """Decorator to validate raw CSV requests"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.mimetype != "text/csv":
+            return create_error_response("Content-Type must be text/csv", 400)
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+# Health responses only ever take one of two shapes, serialize both up front
+_HEALTH_BODIES = {
+    healthy: HealthResponse(
+        status="healthy" if healthy else "degraded",
+        service=settings.SERVICE_NAME,
+        checks={"dependencies": "healthy" if healthy else "failing"},
+    )
+    .model_dump_json()
+    .encode()
+    for healthy in (True, False)
+}
+
+
 @app.route("/health", methods=["GET"])
-def health_check() -> Tuple[Dict[str, Any], int]:
+def health_check() -> Response:
     """Health check endpoint that returns service status"""
     dependencies_healthy = check_dependencies()
-    response = HealthResponse(
-        status="healthy" if dependencies_healthy else "degraded",
-        service=settings.SERVICE_NAME,
-        timestamp=datetime.utcnow(),
-        checks={"dependencies": "healthy" if dependencies_healthy else "failing"},
+    return Response(
+        _HEALTH_BODIES[dependencies_healthy],
+        status=200 if dependencies_healthy else 503,
+        mimetype="application/json",
     )
-    return jsonify(response.model_dump()), 200 if dependencies_healthy else 503
 
 
 @app.route("/process-statement", methods=["POST"])
@@ -147,30 +258,68 @@ def health_check() -> Tuple[Dict[str, Any], int]:
 def process_ib_statement():
     """Process IB statement from CSV content"""
     try:
-        data = StatementRequest(**request.get_json())
+        data = _VALIDATE_STATEMENT_REQUEST(request.get_data(cache=False))
         date_str = parse_date_from_subject(data.subject)
 
-        with temp_csv_file(data.csv_content, date_str) as tmp_file_path:
-            logger.info(f"Processing file: {tmp_file_path}")
-            result = process_statement(tmp_file_path.as_posix())
-            return handle_statement_processing(data, result)
+        logger.info("Processing statement request %s for %s", g.request_id, date_str)
+        return handle_statement_processing(csv_bytes(data.csv_content), date_str)
     except ValidationError as e:
-        logger.error(f"Validation error: {str(e)}")
+        logger.error("Validation error for request %s: %s", g.request_id, e)
+        return create_error_response(str(e), 400)
+    except ValueError as e:
         return create_error_response(str(e), 400)
 
 
+@app.route("/process-statement-stream", methods=["POST"])
+@validate_csv_request
+def process_ib_statement_stream():
+    """Process IB statement streamed as a raw CSV request body"""
+    subject = request.headers.get(SUBJECT_HEADER) or request.args.get(SUBJECT)
+    if not subject:
+        return create_error_response(f"Missing {SUBJECT_HEADER} header", 400)
+    try:
+        date_str = parse_date_from_subject(subject)
+    except ValueError as e:
+        return create_error_response(str(e), 400)
+
+    # Checked before the stream is touched, so an oversized declared body is
+    # rejected without reserving space for it
+    content_length = request.content_length
+    if content_length and content_length > app.config["MAX_CONTENT_LENGTH"]:
+        return create_error_response("Request body too large", 413)
+
+    try:
+        with streamed_csv_file(
+            request.stream, date_str, content_length
+        ) as tmp_file_path:
+            logger.info(
+                "Processing streamed request %s from %s", g.request_id, tmp_file_path
+            )
+            return handle_statement_processing(tmp_file_path.as_posix(), date_str)
+    except UploadStorageError as e:
+        logger.error("Upload failed for request %s: %s", g.request_id, e)
+        return create_error_response(str(e), 507)
+
+
 def shutdown_handler(signum, frame):
     """Handle graceful shutdown"""
     logger.info("Received shutdown signal, cleaning up...")
     exit(0)
 
 
-signal.signal(signal.SIGTERM, shutdown_handler)
-signal.signal(signal.SIGINT, shutdown_handler)
-atexit.register(lambda: logger.info("Application shutting down"))
+def register_shutdown_handlers() -> None:
+    """
+    Install shutdown hooks for the standalone dev server only. Under gunicorn
+    the arbiter owns SIGTERM/SIGINT and reaps the workers itself.
+    """
+    signal.signal(signal.SIGTERM, shutdown_handler)
+    signal.signal(signal.SIGINT, shutdown_handler)
+    atexit.register(lambda: logger.info("Application shutting down"))
 
 
 if __name__ == "__main__":
-    setup_logging()
-    logger.info(f"Starting {settings.SERVICE_NAME} on {settings.HOST}:{settings.PORT}")
+    register_shutdown_handlers()
+    logger.info(
+        "Starting %s on %s:%s", settings.SERVICE_NAME, settings.HOST, settings.PORT
+    )
     app.run(host=settings.HOST, port=settings.PORT)
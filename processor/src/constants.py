@@ -1,5 +1,6 @@
 from typing import Dict, Final
 import os
+import re
 
 # MAster date table
 MASTER_DATES_TABLE: Final = "master_dates"
@@ -7,6 +8,32 @@ METRICS: Final = "metrics"
 # Input N8N request body fields
 CSV_CONTENT: Final = "csv_content"
 SUBJECT: Final = "subject"
+# Streamed CSV requests carry the subject in a header instead of the body
+SUBJECT_HEADER: Final = "X-Subject"
+STREAM_CHUNK_SIZE: Final = 64 * 1024
+UTF8_BOM: Final = b"\xef\xbb\xbf"
+# Cells read as missing, the same defaults pandas.read_csv uses
+CSV_NULL_VALUES: Final = (
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+)
 
 # File paths and directories
 DEFAULT_OUTPUT_DIR: Final = "statement_sections"
@@ -24,13 +51,44 @@ CAP_HEADER: Final = "Header"
 CAP_FOREX: Final = "Forex"
 CAP_STOCK: Final = "Stocks"
 CAP_OPTIONS: Final = "Equity and Index Options"
-# File patterns and formats
-DATE_FORMATS: Final = [
-    "%Y-%m-%d",  # 2024-01-30
-    "%Y-%m-%d %H:%M:%S",  # 2024-01-30 15:30:00
-    "%d%b%y",  # 30JAN24
-    "%m/%d/%Y",  # 01/30/2024
-]
+CAP_ASSET_CATEGORY: Final = "Asset Category"
+# Total/Subtotal rows are labelled in the asset category column; matched
+# case-insensitively, "total" covers both
+TOTAL_MARKER: Final = "total"
+# Numeric columns of the Trades section, after clean_column_names
+TRADES_NUMERIC_COLS: Final = (
+    "quantity",
+    "t._price",
+    "c._price",
+    "proceeds",
+    "comm/fee",
+    "basis",
+    "realized_p/l",
+    "mtm_p/l",
+)
+# Numeric columns of the MTM summary, as named in the statement
+MTM_NUMERIC_COLS: Final = (
+    "Prior Quantity",
+    "Current Quantity",
+    "Prior Price",
+    "Current Price",
+    "Mark-to-Market P/L Position",
+    "Mark-to-Market P/L Transaction",
+    "Mark-to-Market P/L Commissions",
+    "Mark-to-Market P/L Other",
+    "Mark-to-Market P/L Total",
+)
+# Option symbols, e.g. "AAPL 17JAN25 200 C"
+OPTION_SYMBOL_PATTERN: Final = re.compile(
+    r"^(?P<underlying>.+?)\s+(?P<day>\d{1,2})(?P<month>[A-Za-z]{3})(?P<year>\d{2})"
+    r"\s+(?P<strike>\d+(?:\.\d+)?)\s+(?P<contract_type>[CP])$"
+)
+MONTH_NUMBERS: Final = {
+    month: f"{number:02d}"
+    for number, month in enumerate(
+        "JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC".split(), start=1
+    )
+}
 
 # Asset categories mapping
 ASSET_CATEGORY_REPLACE: Dict[str, str] = {
@@ -41,6 +99,8 @@ ASSET_CATEGORY_REPLACE: Dict[str, str] = {
 # DataFrame keys and columns
 MTM_SUMMARY_KEY: Final = "Mark-to-Market Performance Summary"
 TRADES_KEY: Final = "Trades"
+# Statement sections the processor reads; the rest are never parsed
+PROCESSED_SECTIONS: Final = (MTM_SUMMARY_KEY, TRADES_KEY)
 
 # Default values
 DEFAULT_EXPIRY_DATE: Final = "9999-01-01"
@@ -61,19 +121,59 @@ MARKET_PL_POS: Final = "mark-to-market_p/l_position"
 MARKET_PL_TRANS: Final = "mark-to-market_p/l_transaction"
 IS_NEW_COL: Final = "is_new"
 PL_DELTA_COL: Final = "pl_delta"
+EXCHANGE_RATE_COL: Final = "exchange_rate_eur"
+# Column selections, in export order
+BASE_TABLE_COLS: Final = [
+    ASSET_CATEGORY_COL,
+    SYMBOL_COL,
+    PRIOR_QUANTITY_COL,
+    CURRENT_QUANTITY_COL,
+    PRIOR_PRICE_COL,
+    CURRENT_PRICE_COL,
+    MARKET_PL_POS,
+    MARKET_PL_TRANS,
+    IS_NEW_COL,
+]
+# Numeric base table columns stored with 2 decimals
+ROUND_COLS: Final = (
+    PRIOR_QUANTITY_COL,
+    CURRENT_QUANTITY_COL,
+    PRIOR_PRICE_COL,
+    CURRENT_PRICE_COL,
+    PL_DELTA_COL,
+    MARKET_PL_TRANS,
+)
+FOREX_COLS: Final = [
+    ASSET_CATEGORY_COL,
+    CURRENCY_COL,
+    PRIOR_QUANTITY_COL,
+    CURRENT_QUANTITY_COL,
+    EXCHANGE_RATE_COL,
+    PL_DELTA_COL,
+]
+# Low-cardinality label columns, stored as categoricals once names are cleaned
+CATEGORICAL_COLS: Final = (ASSET_CATEGORY_COL, "header")
 
 
-# DataFrame export mapping
-DF_EXPORT_MAPPING: Dict[str, str] = {
-    STOCKS_TYPE: STOCKS_TYPE,
-    OPTIONS_TYPE: OPTIONS_TYPE,
-    OPTION_TRADES: OPTION_TRADES,
-    STOCK_TRADES: STOCK_TRADES,
-    TOTAL_PROCEEDS: TOTAL_PROCEEDS,
-    FOREX_TYPE: FOREX_TYPE,
-}
+# Processed tables exported to the database, each under its own name
+EXPORT_TYPES: Final = frozenset(
+    {
+        STOCKS_TYPE,
+        OPTIONS_TYPE,
+        OPTION_TRADES,
+        STOCK_TRADES,
+        TOTAL_PROCEEDS,
+        FOREX_TYPE,
+    }
+)
 
 # Options contract multiplier
 OPTIONS_CONTRACT_MULTIPLIER: Final = 100
 
 DB_PATH = os.getenv("DB_PATH", "/app/db/statements.db")
+# Directory for Parquet copies of parsed statements, keyed by content hash;
+# unset disables the cache
+SECTION_CACHE_DIR = os.getenv("SECTION_CACHE_DIR")
+# Bump whenever a change alters the parsed section frames, so older cache
+# entries are no longer served
+SECTION_CACHE_VERSION: Final = 2
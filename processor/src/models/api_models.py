@@ -1,10 +1,11 @@
 from pydantic import BaseModel
-from typing import Optional, Literal
+from typing import Dict, Optional, Literal
 
 
 class HealthResponse(BaseModel):
-    status: Literal["healthy"] = "healthy"
-    service: Literal["ibkr-processor"] = "ibkr-processor"
+    status: Literal["healthy", "degraded"] = "healthy"
+    service: str = "ibkr-processor"
+    checks: Dict[str, str] = {}
 
 
 class StatementRequest(BaseModel):
@@ -17,3 +18,4 @@ class StatementResponse(BaseModel):
     status: str
     message: str
     error: Optional[str] = None
+    data: Optional[Dict[str, float]] = None
@@ -3,13 +3,16 @@ Interactive Brokers statement processor module.
 This module handles the processing of IB statements and exports the processed data.
 """
 
-from datetime import datetime
+from datetime import date
+import logging
+import numpy as np
 import pandas as pd
-from typing import Tuple
+from typing import Optional, Tuple, Union
 
 from constants import (
     MTM_SUMMARY_KEY,
     TRADES_KEY,
+    PROCESSED_SECTIONS,
     ASSET_CATEGORY_COL,
     SYMBOL_COL,
     CURRENCY_COL,
@@ -19,15 +22,15 @@ from constants import (
     DEFAULT_STRIKE,
     DEFAULT_CONTRACT_TYPE,
     OPTIONS_CONTRACT_MULTIPLIER,
-    DF_EXPORT_MAPPING,
+    EXPORT_TYPES,
     CAP_HEADER,
     OPTION_TRADES,
     STOCK_TRADES,
     PRIOR_PRICE_COL,
     CURRENT_PRICE_COL,
     CURRENT_QUANTITY_COL,
-    PRIOR_QUANTITY_COL,
-    PL_DELTA_COL,
+    EXCHANGE_RATE_COL,
+    FOREX_COLS,
     STOCKS_TYPE,
     FOREX_TYPE,
     OPTIONS_TYPE,
@@ -44,22 +47,50 @@ from utils.df_operations import (
     parse_option_symbol,
     auto_convert_types,
     create_base_tables,
+    aggregate_trades,
 )
-from utils.db_operations import DatabaseManager
+from utils.db_operations import get_database_manager
+
+logger = logging.getLogger(__name__)
+
+
+def as_float_array(values: pd.Series) -> np.ndarray:
+    """C-contiguous float64 copy of a column; missing values count as 0."""
+    return np.ascontiguousarray(values.to_numpy(dtype=np.float64, na_value=0.0))
+
+
+# Smallest statement that exercises every parsing path, used by warmup()
+_WARMUP_STATEMENT = """\
+Mark-to-Market Performance Summary,Header,Asset Category,Symbol,Prior Quantity,Current Quantity,Prior Price,Current Price,Mark-to-Market P/L Position,Mark-to-Market P/L Transaction
+Mark-to-Market Performance Summary,Data,Stocks,AAA,0,1,0,1.5,0,0
+Mark-to-Market Performance Summary,Data,Equity and Index Options,AAA 17JAN25 2 C,0,-1,0,0.5,0,0
+Mark-to-Market Performance Summary,Data,Forex,EUR,1,1,1,1,0,0
+Mark-to-Market Performance Summary,Data,Total,,,,,,0,0
+Trades,Header,DataDiscriminator,Asset Category,Currency,Symbol,Date/Time,Quantity,Proceeds
+Trades,Data,Order,Stocks,USD,AAA,"2025-01-10, 10:00:00",1,-1.5
+Trades,Data,Order,Equity and Index Options,USD,AAA 17JAN25 2 C,"2025-01-10, 10:00:00",-1,50
+"""
 
 
 class IBStatementProcessor:
-    def __init__(self, input_file: str):
-        """Initialize the processor with input file."""
+    def __init__(self, input_file: Union[str, bytes], input_date: Optional[str] = None):
+        """
+        Initialize the processor with input file.
+
+        The statement date is taken from `input_date` when given (YYYYMMDD),
+        otherwise it is extracted from the file name.
+        """
         self.input_file = input_file
-        self.input_date = validate_input_file(input_file)
-        self.part_date = datetime.strptime(self.input_date, "%Y%m%d").isoformat()[:10]
+        self.input_date = input_date or validate_input_file(input_file)
+        # YYYYMMDD -> YYYY-MM-DD; date() still rejects impossible dates
+        ymd = self.input_date
+        self.part_date = date(int(ymd[:4]), int(ymd[4:6]), int(ymd[6:])).isoformat()
         self.dataframes = {}
         self.processed_data = {}
 
     def process(self) -> None:
         """Main processing method."""
-        self.dataframes = split_ib_statement(self.input_file)
+        self.dataframes = split_ib_statement(self.input_file, PROCESSED_SECTIONS)
         self._process_mtm_summary()
         if TRADES_KEY in self.dataframes:
             self._process_trades()
@@ -70,7 +101,8 @@ class IBStatementProcessor:
 
     def _process_mtm_summary(self) -> None:
         """Process Mark-to-Market summary data."""
-        df_base_daily = self.dataframes[MTM_SUMMARY_KEY]
+        # Sections are released as they are consumed
+        df_base_daily = self.dataframes.pop(MTM_SUMMARY_KEY)
         df_base_daily = (
             df_base_daily.pipe(post_process_df)
             .drop(CAP_HEADER, axis=1)
@@ -82,17 +114,8 @@ class IBStatementProcessor:
 
         if df_forex is not None:
             df_forex = df_forex.rename(
-                columns={SYMBOL_COL: CURRENCY_COL, PRIOR_PRICE_COL: "exchange_rate_eur"}
-            )[
-                [
-                    ASSET_CATEGORY_COL,
-                    CURRENCY_COL,
-                    PRIOR_QUANTITY_COL,
-                    CURRENT_QUANTITY_COL,
-                    "exchange_rate_eur",
-                    PL_DELTA_COL,
-                ]
-            ]
+                columns={SYMBOL_COL: CURRENCY_COL, PRIOR_PRICE_COL: EXCHANGE_RATE_COL}
+            )[FOREX_COLS]
 
         self.processed_data.update(
             {STOCKS_TYPE: df_stocks, OPTIONS_TYPE: df_options, FOREX_TYPE: df_forex}
@@ -104,9 +127,12 @@ class IBStatementProcessor:
         """Separate trades into stocks and options."""
         trades_df = (
             trades_df.pipe(clean_column_names)
+            .pipe(auto_convert_types)
             .assign(
                 asset_category=lambda df: (
-                    df[ASSET_CATEGORY_COL].replace(ASSET_CATEGORY_REPLACE)
+                    df[ASSET_CATEGORY_COL].cat.rename_categories(
+                        lambda category: ASSET_CATEGORY_REPLACE.get(category, category)
+                    )
                 )
             )
             .loc[lambda df: df["header"] == "Data"]
@@ -114,41 +140,21 @@ class IBStatementProcessor:
 
         stock_trades = trades_df[trades_df[ASSET_CATEGORY_COL] == "stocks"]
         options_trades = trades_df[trades_df[ASSET_CATEGORY_COL] == "options"]
-        options_trades = parse_option_symbol(options_trades)
 
         return stock_trades, options_trades
 
     def _process_trades(self) -> None:
         """Process trades data."""
-        df_base_trades = self.dataframes[TRADES_KEY]
+        df_base_trades = self.dataframes.pop(TRADES_KEY)
 
         # Separate and process trades
         stock_trades, options_trades = self._separate_trades(df_base_trades)
 
         # Process options trades
-        op_trades_agg = (
-            options_trades.pipe(auto_convert_types)
-            .groupby(SYMBOL_COL)
-            .agg(
-                currency=(CURRENCY_COL, "first"),
-                total_quantity=("quantity", "sum"),
-                total_proceeds=("proceeds", "sum"),
-            )
-            .reset_index()
-            .pipe(parse_option_symbol)
-        )
+        op_trades_agg = options_trades.pipe(aggregate_trades).pipe(parse_option_symbol)
 
         # Process stock trades
-        stock_trades_agg = (
-            stock_trades.pipe(auto_convert_types)
-            .groupby(SYMBOL_COL)
-            .agg(
-                currency=(CURRENCY_COL, "first"),
-                total_quantity=("quantity", "sum"),
-                total_proceeds=("proceeds", "sum"),
-            )
-            .reset_index()
-        )
+        stock_trades_agg = stock_trades.pipe(aggregate_trades)
         stock_proceeds = stock_trades_agg.assign(
             underlying=lambda x: x[SYMBOL_COL],
             exp_date=DEFAULT_EXPIRY_DATE,
@@ -158,7 +164,11 @@ class IBStatementProcessor:
         )
 
         options_proceeds = op_trades_agg.assign(asset_category=OPTIONS_TYPE)
-        df_total_proceeds = pd.concat([stock_proceeds, options_proceeds])
+        # Both frames come out of aggregate_trades + the same derived columns in
+        # the same order, so concat has nothing to align or sort
+        df_total_proceeds = pd.concat(
+            [stock_proceeds, options_proceeds], ignore_index=True, sort=False
+        )
 
         self.processed_data.update(
             {
@@ -184,30 +194,39 @@ class IBStatementProcessor:
         df_options = self.processed_data[OPTIONS_TYPE]
         df_forex = self.processed_data[FOREX_TYPE]
 
-        stock_value = (
-            df_stocks[CURRENT_QUANTITY_COL] * df_stocks[CURRENT_PRICE_COL]
-        ).sum()
-        option_value = (
-            df_options[CURRENT_QUANTITY_COL] * df_options[CURRENT_PRICE_COL]
-        ).sum() * OPTIONS_CONTRACT_MULTIPLIER
+        # Accounts without options (or stocks, or forex) skip those tables
+        stock_value = 0.0
+        if df_stocks is not None and not df_stocks.empty:
+            stock_value = np.dot(
+                as_float_array(df_stocks[CURRENT_QUANTITY_COL]),
+                as_float_array(df_stocks[CURRENT_PRICE_COL]),
+            )
+
+        option_value = option_credit = option_debit = 0.0
+        if df_options is not None and not df_options.empty:
+            # Fused multiply-sum over the options book, split by position side
+            option_quantity = as_float_array(df_options[CURRENT_QUANTITY_COL])
+            option_price = as_float_array(df_options[CURRENT_PRICE_COL])
+            short = option_quantity < 0
+            long = option_quantity > 0
+            option_value = (
+                np.dot(option_quantity, option_price) * OPTIONS_CONTRACT_MULTIPLIER
+            )
+            option_credit = (
+                np.dot(option_quantity[short], option_price[short])
+                * OPTIONS_CONTRACT_MULTIPLIER
+            ).round(2)
+            option_debit = (
+                np.dot(option_quantity[long], option_price[long])
+                * OPTIONS_CONTRACT_MULTIPLIER
+            ).round(2)
+
+        forex_value = 0.0
+        if df_forex is not None and not df_forex.empty:
+            forex_value = df_forex[CURRENT_QUANTITY_COL].sum()
 
         metric_gross_val = stock_value + option_value
-        metric_nav = metric_gross_val + df_forex[CURRENT_QUANTITY_COL].sum()
-        option_credit = (
-            (
-                df_options[df_options[CURRENT_QUANTITY_COL] < 0][CURRENT_QUANTITY_COL]
-                * df_options[df_options[CURRENT_QUANTITY_COL] < 0][CURRENT_PRICE_COL]
-            ).sum()
-            * OPTIONS_CONTRACT_MULTIPLIER
-        ).round(2)
-
-        option_debit = (
-            (
-                df_options[df_options[CURRENT_QUANTITY_COL] > 0][CURRENT_QUANTITY_COL]
-                * df_options[df_options[CURRENT_QUANTITY_COL] > 0][CURRENT_PRICE_COL]
-            ).sum()
-            * OPTIONS_CONTRACT_MULTIPLIER
-        ).round(2)
+        metric_nav = metric_gross_val + forex_value
 
         self.metrics = {
             "gross_value": metric_gross_val,
@@ -219,47 +238,66 @@ class IBStatementProcessor:
 
     def _prepare_export_data(self) -> None:
         """Prepare data for export."""
-        self.export_data = {
-            key: df.copy()
-            for key, df in self.processed_data.items()
-            if key in DF_EXPORT_MAPPING
-        }
-
-        for _, df in self.export_data.items():
-            if not df.empty:
-                key_column = SYMBOL_COL if SYMBOL_COL in df.columns else CURRENCY_COL
-                df[PK_COL] = df[key_column] + "_" + self.input_date
-                df[DATA_DATE_PART_COL] = self.part_date
+        # assign() returns new frames that share the processed columns, so only
+        # the key and partition columns are materialized
+        self.export_data = {}
+        for key, df in self.processed_data.items():
+            if key not in EXPORT_TYPES or df is None or df.empty:
+                continue
+            key_column = SYMBOL_COL if SYMBOL_COL in df.columns else CURRENCY_COL
+            self.export_data[key] = df.assign(
+                **{
+                    PK_COL: df[key_column] + "_" + self.input_date,
+                    DATA_DATE_PART_COL: self.part_date,
+                }
+            )
 
     def export(self) -> None:
         """Export processed data to SQLite database with dates in ISO format."""
-        db_manager = DatabaseManager(DB_PATH)
-
-        for key, df in self.export_data.items():
-            if not df.empty:
-                if DATA_DATE_PART_COL in df.columns:
-                    df[DATA_DATE_PART_COL] = pd.to_datetime(
-                        df[DATA_DATE_PART_COL]
-                    ).dt.date
-                print(key)
-                db_manager.dataframe_to_sql(df, key)
-
-        formatted_date = pd.to_datetime(self.part_date).date()
-        df_date = pd.DataFrame([[formatted_date]], columns=[DATA_DATE_PART_COL])
-        db_manager.dataframe_to_sql(df_date, MASTER_DATES_TABLE)
-
-
-def process_statement(input_file: str) -> IBStatementProcessor:
+        db_manager = get_database_manager(DB_PATH)
+
+        with db_manager.session():
+            for key, df in self.export_data.items():
+                if not df.empty:
+                    if DATA_DATE_PART_COL in df.columns:
+                        df[DATA_DATE_PART_COL] = pd.to_datetime(
+                            df[DATA_DATE_PART_COL]
+                        ).dt.date
+                    logger.debug("Exporting %s (%d rows)", key, len(df))
+                    db_manager.dataframe_to_sql(df, key)
+
+            formatted_date = pd.to_datetime(self.part_date).date()
+            df_date = pd.DataFrame([[formatted_date]], columns=[DATA_DATE_PART_COL])
+            db_manager.dataframe_to_sql(df_date, MASTER_DATES_TABLE)
+
+
+def process_statement(
+    input_file: Union[str, bytes], input_date: Optional[str] = None
+) -> IBStatementProcessor:
     """
     Main function to process an IB statement file.
 
     Args:
-        input_file: Path to the input CSV file
+        input_file: Path to the input CSV file, or its content as bytes
+        input_date: Statement date as YYYYMMDD, required when input_file is bytes
 
     Returns:
         IBStatementProcessor: Processor instance with processed data
     """
-    processor = IBStatementProcessor(input_file)
+    processor = IBStatementProcessor(input_file, input_date)
     processor.process()
     processor.export()
     return processor
+
+
+def warmup() -> None:
+    """
+    Run a tiny synthetic statement through the processing pipeline, without
+    exporting it, so lazily initialized pandas internals are ready up front.
+    """
+    try:
+        IBStatementProcessor(
+            _WARMUP_STATEMENT.encode(), input_date="20000101"
+        ).process()
+    except Exception as e:
+        logger.warning("Warmup failed: %s", e)
@@ -1,14 +1,109 @@
 import sqlite3
 import pandas as pd
+from contextlib import contextmanager
+from datetime import date, datetime
 from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+from functools import lru_cache
 import os
+import threading
+
+# Same ISO adapters pandas registers for to_sql; Python 3.12 has no defaults
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for SQLite."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def file_identity(path: str) -> Optional[Tuple[int, int]]:
+    """Device and inode of a file, or None when it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_dev, st.st_ino
 
 
 class DatabaseManager:
     def __init__(self, db_path: str):
         """Initialize database connection."""
         self.db_path = db_path
-        Path(os.path.dirname(db_path)).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._depth = 0
+        # INSERT statements for tables already created, by table and columns
+        self._insert_sql: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._connect()
+
+    def _connect(self) -> None:
+        """Open the long-lived connection and note which file it writes to."""
+        Path(os.path.dirname(self.db_path)).mkdir(parents=True, exist_ok=True)
+        # One long-lived connection in autocommit mode; sessions issue their
+        # own BEGIN/COMMIT and the lock keeps them from interleaving
+        self._conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False
+        )
+        # Metabase mounts the database read-only, and WAL readers need write
+        # access for the -shm file; keep the rollback journal (this also turns
+        # a file left in WAL mode back)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._file: Optional[Tuple[int, int]] = file_identity(self.db_path)
+        self._insert_sql.clear()
+
+    def _reconnect_if_stale(self) -> None:
+        """
+        Reopen the connection when the last session failed inside SQLite, or
+        when the database file was deleted or replaced since it was opened;
+        an open connection would keep writing to the old, unlinked file.
+        """
+        if self._file is None or file_identity(self.db_path) != self._file:
+            self.close()
+            self._connect()
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    @contextmanager
+    def session(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run all writes made inside the block in one transaction, so they
+        commit together or not at all. Nested sessions join the outer one.
+        """
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self._conn
+                finally:
+                    self._depth -= 1
+                return
+
+            self._reconnect_if_stale()
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException as e:
+                try:
+                    self._conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    # SQLite may have rolled back already, e.g. after a full
+                    # disk; the original error is the one to report
+                    pass
+                # The rollback also undoes any CREATE TABLE made in the session
+                self._insert_sql.clear()
+                if isinstance(e, sqlite3.Error):
+                    # Start the next session on a fresh connection
+                    self._file = None
+                raise
+            finally:
+                self._depth = 0
 
     def dataframe_to_sql(self, df: pd.DataFrame, table_name: str) -> None:
         """
@@ -18,5 +113,40 @@ class DatabaseManager:
         if df.empty:
             return None
 
-        with sqlite3.connect(self.db_path) as conn:
-            df.to_sql(name=table_name, con=conn, if_exists="append", index=False)
+        with self.session() as conn:
+            conn.executemany(
+                self._insert_statement(df, table_name),
+                df.itertuples(index=False, name=None),
+            )
+
+    def _insert_statement(self, df: pd.DataFrame, table_name: str) -> str:
+        """
+        Return the INSERT for this table and column set, creating the table
+        with the DDL pandas' to_sql would emit on first use.
+        """
+        key = (table_name, tuple(map(str, df.columns)))
+        sql = self._insert_sql.get(key)
+        if sql is None:
+            schema = pd.io.sql.get_schema(df, table_name, con=self._conn)
+            self._conn.execute(
+                schema.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1)
+            )
+            columns = ", ".join(map(quote_identifier, key[1]))
+            placeholders = ", ".join("?" * len(key[1]))
+            sql = (
+                f"INSERT INTO {quote_identifier(table_name)} ({columns}) "
+                f"VALUES ({placeholders})"
+            )
+            self._insert_sql[key] = sql
+        return sql
+
+
+@lru_cache(maxsize=None)
+def get_database_manager(db_path: str) -> DatabaseManager:
+    """
+    Return the process-wide manager for a database, connecting on first use.
+    Created lazily, so a gunicorn --preload master never holds a connection
+    its forked workers would inherit. The cached manager reopens its
+    connection itself after a SQLite error or a replaced database file.
+    """
+    return DatabaseManager(db_path)
@@ -1,94 +1,136 @@
 """DataFrame processing utilities for IB statement processing."""
 
+import logging
+import numpy as np
 import pandas as pd
 from typing import Tuple
 from constants import (
-    DATE_FORMATS,
     SYMBOL_COL,
     ASSET_CATEGORY_COL,
+    BASE_TABLE_COLS,
+    CAP_ASSET_CATEGORY,
+    CATEGORICAL_COLS,
     CAP_HEADER,
     CAP_FOREX,
     CAP_OPTIONS,
     CAP_STOCK,
     OPTIONS_TYPE,
     FOREX_TYPE,
+    STOCKS_TYPE,
     PRIOR_PRICE_COL,
     CURRENT_PRICE_COL,
     PRIOR_QUANTITY_COL,
-    CURRENT_QUANTITY_COL,
+    CURRENCY_COL,
     MARKET_PL_POS,
-    MARKET_PL_TRANS,
-    IS_NEW_COL,
+    MONTH_NUMBERS,
+    MTM_NUMERIC_COLS,
+    OPTION_SYMBOL_PATTERN,
     PL_DELTA_COL,
+    ROUND_COLS,
+    TOTAL_MARKER,
+    TRADES_NUMERIC_COLS,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def clean_column_names(df: pd.DataFrame) -> pd.DataFrame:
-    """Cleans column names by converting to lowercase and replacing spaces with underscores."""
-    return df.rename(columns=lambda x: x.lower().replace(" ", "_"))
+    """
+    Cleans column names by converting to lowercase and replacing spaces with underscores.
+    Label columns become categoricals, so filtering on them compares integer codes.
+    """
+    df = df.rename(columns=lambda x: x.lower().replace(" ", "_"))
+    categoricals = {col: "category" for col in CATEGORICAL_COLS if col in df.columns}
+    return df.astype(categoricals) if categoricals else df
 
 
 def post_process_df(df: pd.DataFrame) -> pd.DataFrame:
     """Post-processes DataFrame by removing headers and totals."""
     try:
-        header_indices = df[df[CAP_HEADER] == CAP_HEADER].index
-        if len(header_indices) > 0:
-            last_header_idx = header_indices[-1]
-            df = df.iloc[:last_header_idx]
-
-        mask = (
-            df.astype(str)
-            .apply(lambda x: ~x.str.contains("Total|Subtotal", case=False, na=False))
-            .all(axis=1)
-        )
-        df = df[mask]
-        return df.reset_index(drop=True)
+        # Rows from the last repeated header on belong to another sub-table
+        keep = df[CAP_HEADER].to_numpy() != CAP_HEADER
+        header_rows = np.flatnonzero(~keep)
+        if header_rows.size:
+            keep[header_rows[-1] :] = False
+
+        labels = df[CAP_ASSET_CATEGORY].to_numpy(dtype=str, na_value="")
+        keep &= np.char.find(np.char.lower(labels), TOTAL_MARKER) < 0
+
+        # One positional take (a new frame, not a slice); setting the index
+        # avoids reset_index's copy
+        df = df.take(np.flatnonzero(keep))
+        df.index = pd.RangeIndex(len(df))
+        # The rows of a second sub-table leave these columns as strings
+        return auto_convert_types(df, MTM_NUMERIC_COLS)
     except Exception as e:
-        print(f"Error in post-processing: {str(e)}")
+        logger.warning("Error in post-processing: %s", e)
         return df
 
 
 def parse_option_symbol(df: pd.DataFrame, symbol_col: str = SYMBOL_COL) -> pd.DataFrame:
     """Parses option symbols into separate columns."""
-    split_series = df[symbol_col].str.split(" ", expand=True)
+    parts = df[symbol_col].str.extract(OPTION_SYMBOL_PATTERN)
 
     return df.assign(
-        underlying=split_series[0],
-        exp_date=lambda _: pd.to_datetime(split_series[1], format="%d%b%y").dt.strftime(
-            "%Y-%m-%d"
-        ),
-        strike=lambda _: pd.to_numeric(split_series[2]),
-        contract_type=split_series[3],
+        underlying=parts["underlying"],
+        exp_date="20"
+        + parts["year"]
+        + "-"
+        + parts["month"].str.upper().map(MONTH_NUMBERS)
+        + "-"
+        + parts["day"].str.zfill(2),
+        strike=pd.to_numeric(parts["strike"]),
+        contract_type=parts["contract_type"],
     )
 
 
-def auto_convert_types(df: pd.DataFrame) -> pd.DataFrame:
-    """Automatically converts column types based on content."""
-    for col in df.columns:
-        if df[col].dtype == "object":
-            numeric_conversion = pd.to_numeric(df[col], errors="coerce")
-            if not numeric_conversion.isna().all():
-                df[col] = numeric_conversion
-                continue
-
-            try:
-                for fmt in DATE_FORMATS:
-                    try:
-                        date_conversion = pd.to_datetime(
-                            df[col], format=fmt, errors="coerce"
-                        )
-                        if not date_conversion.isna().all():
-                            df[col] = date_conversion
-                            break
-                    except ValueError:
-                        continue
-            except Exception as e:
-                print(f"Could not convert {col}: {str(e)}")
-                continue
+def auto_convert_types(
+    df: pd.DataFrame, numeric_cols: Tuple[str, ...] = TRADES_NUMERIC_COLS
+) -> pd.DataFrame:
+    """Converts the known numeric columns of a statement table, one pass each."""
+    for col in numeric_cols:
+        if col in df.columns and df[col].dtype == "object":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
 
     return df
 
 
+def aggregate_trades(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregates trades per symbol: first currency, summed quantity and proceeds.
+    Equivalent to a sorted groupby(...).agg(first, sum, sum), computed with one
+    factorize and a bincount per column instead of pandas' groupby dispatch.
+    """
+    codes, symbols = pd.factorize(df[SYMBOL_COL], sort=True)
+    valid = codes >= 0
+    codes = codes[valid]
+
+    def grouped_sum(col: str) -> np.ndarray:
+        values = df[col].to_numpy()[valid]
+        sums = np.bincount(
+            codes,
+            weights=np.nan_to_num(values.astype(np.float64)),
+            minlength=len(symbols),
+        )
+        return sums.astype(values.dtype if values.dtype.kind in "iu" else np.float64)
+
+    # First non-null currency per symbol, as groupby's "first" does
+    currencies = df[CURRENCY_COL].to_numpy()[valid]
+    present = pd.notna(currencies)
+    first_codes, first_idx = np.unique(codes[present], return_index=True)
+    currency = np.full(len(symbols), None, dtype=object)
+    currency[first_codes] = currencies[present][first_idx]
+
+    return pd.DataFrame(
+        {
+            SYMBOL_COL: symbols,
+            CURRENCY_COL: currency,
+            "total_quantity": grouped_sum("quantity"),
+            "total_proceeds": grouped_sum("proceeds"),
+        }
+    )
+
+
 def create_base_tables(
     df_base_daily: pd.DataFrame,
 ) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
@@ -101,36 +143,23 @@ def create_base_tables(
             x[CURRENT_PRICE_COL], errors="coerce"
         ).fillna(0.0),
         is_new=lambda x: x[PRIOR_QUANTITY_COL] == 0,
-    )[
-        [
-            ASSET_CATEGORY_COL,
-            SYMBOL_COL,
-            PRIOR_QUANTITY_COL,
-            CURRENT_QUANTITY_COL,
-            PRIOR_PRICE_COL,
-            CURRENT_PRICE_COL,
-            MARKET_PL_POS,
-            MARKET_PL_TRANS,
-            IS_NEW_COL,
-        ]
-    ].rename(
+    )[BASE_TABLE_COLS].rename(
         columns={
             MARKET_PL_POS: PL_DELTA_COL,
         }
     )
 
-    float_columns = df_base.select_dtypes(include=["float64"]).columns
-    df_base[float_columns] = df_base[float_columns].round(2)
+    for col in ROUND_COLS:
+        if df_base[col].dtype == "float64":
+            df_base[col] = df_base[col].round(2)
 
-    asset_categories = df_base[ASSET_CATEGORY_COL].unique()
-    df_by_category = {
-        category: df_base.loc[lambda x: x[ASSET_CATEGORY_COL] == category].copy()
-        for category in asset_categories
-    }
+    df_by_category = dict(
+        tuple(df_base.groupby(ASSET_CATEGORY_COL, sort=False, observed=True))
+    )
 
     df_stocks = df_by_category.get(CAP_STOCK)
     if df_stocks is not None:
-        df_stocks[ASSET_CATEGORY_COL] = df_stocks[ASSET_CATEGORY_COL].str.lower()
+        df_stocks[ASSET_CATEGORY_COL] = STOCKS_TYPE
 
     df_options = df_by_category.get(CAP_OPTIONS)
     if df_options is not None:
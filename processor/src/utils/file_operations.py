@@ -1,67 +1,249 @@
 """File operations utilities for IB statement processing."""
 
+import hashlib
+import logging
+import mmap
 import os
-from typing import Dict, List
+import re
+import shutil
+import tempfile
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import (
+    Collection,
+    DefaultDict,
+    Dict,
+    Iterator,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
+import numpy as np
 import pandas as pd
-from io import StringIO
+import pyarrow as pa
+from pyarrow import csv as pacsv
+from io import BytesIO
+from urllib.parse import quote, unquote
+from constants import (
+    CSV_NULL_VALUES,
+    SECTION_CACHE_DIR,
+    SECTION_CACHE_VERSION,
+    UTF8_BOM,
+)
 
+logger = logging.getLogger(__name__)
 
-def split_ib_statement(file_path: str) -> Dict[str, pd.DataFrame]:
+ARROW_CONVERT_OPTIONS = pacsv.ConvertOptions(
+    null_values=CSV_NULL_VALUES, strings_can_be_null=True
+)
+
+
+@lru_cache(maxsize=8)
+def section_line_pattern(include: Optional[Tuple[str, ...]] = None) -> Pattern[bytes]:
+    """
+    Compiles the regex that splits statement lines into section name and body.
+    With `include`, only lines of those sections match.
+    """
+    if include is None:
+        quoted, unquoted = rb'[^"\n]*', rb"[^,\n]*"
+    else:
+        quoted = unquoted = b"|".join(re.escape(name.encode()) for name in include)
+    # The separator after the name is consumed in both forms, so quoted and
+    # unquoted section names yield the same body
+    return re.compile(
+        rb'^(?:"(?P<quoted>%s)",?|(?P<name>%s),)(?P<rest>[^\n]*\n?)'
+        % (quoted, unquoted),
+        re.MULTILINE,
+    )
+
+
+@contextmanager
+def mapped_file(path: str) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Yields the content of a file, without a UTF-8 BOM, as a read-only view of
+    a memory mapping, so scanning it doesn't copy the whole file.
+    """
+    with open(path, "rb") as f:
+        # Empty files can't be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = len(UTF8_BOM) if mm[: len(UTF8_BOM)] == UTF8_BOM else 0
+            with memoryview(mm) as view, view[start:] as data:
+                yield data
+
+
+def collect_sections(
+    data: Union[bytes, memoryview], pattern: Pattern[bytes]
+) -> DefaultDict[bytes, bytearray]:
+    """
+    Groups statement lines by section name in one regex scan over the raw
+    bytes; only the matched line bodies are copied out.
+    """
+    # Sections differ in width (and can be ragged), so a whole-file read_csv
+    # can't replace this step
+    sections: DefaultDict[bytes, bytearray] = defaultdict(bytearray)
+    for match in pattern.finditer(data):
+        quoted, name, rest = match.groups()
+        sections[name if quoted is None else quoted] += rest
+    return sections
+
+
+def split_ib_statement(
+    source: Union[str, bytes], include: Optional[Collection[str]] = None
+) -> Dict[str, pd.DataFrame]:
     """
     Splits an Interactive Brokers CSV statement into separate DataFrames for each section.
+    Accepts either a file path or the statement content as bytes.
+    When `include` is given, lines of any other section are dropped unparsed.
     """
-    with open(file_path, "r") as f:
-        lines = f.readlines()
+    if isinstance(source, str):
+        with mapped_file(source) as data:
+            return parse_sections(data, include)
+    return parse_sections(source.removeprefix(UTF8_BOM), include)
 
-    sections: Dict[str, List[str]] = {}
-    for line in lines:
-        if line.startswith('"'):
-            section_name = line[1 : line.find('"', 1)]
-            rest_of_line = line[line.find('"', 1) + 1 :]
-        else:
-            section_name = line[: line.find(",")]
-            rest_of_line = line[line.find(",") + 1 :]
 
-        if section_name not in sections:
-            sections[section_name] = []
-        sections[section_name].append(rest_of_line)
+def parse_sections(
+    data: Union[bytes, memoryview], include: Optional[Collection[str]] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Parses the sections of raw statement content, reusing the cached frames
+    of identical content when SECTION_CACHE_DIR is set.
+    """
+    include = None if include is None else tuple(include)
+    cache_dir = None
+    if SECTION_CACHE_DIR:
+        # Entries are only valid for the parser and library versions that
+        # wrote them
+        versions = (SECTION_CACHE_VERSION, pd.__version__, pa.__version__)
+        digest = hashlib.sha256(data)
+        digest.update(repr((versions, include)).encode())
+        cache_dir = os.path.join(SECTION_CACHE_DIR, digest.hexdigest())
+        if os.path.isdir(cache_dir):
+            return read_cached_sections(cache_dir)
 
+    sections = collect_sections(data, section_line_pattern(include))
     dataframes = {}
-    for section_name, section_lines in sections.items():
+    for section_name, section_content in sections.items():
         try:
-            df = pd.read_csv(StringIO("".join(section_lines)))
-            dataframes[section_name] = df.reset_index(drop=True)
+            df = read_section(bytes(section_content))
+            dataframes[section_name.decode()] = df.reset_index(drop=True)
         except:
             pass
+
+    if cache_dir is not None:
+        write_cached_sections(cache_dir, dataframes)
     return dataframes
 
 
-def validate_input_file(input_file: str) -> str:
+def read_cached_sections(cache_dir: str) -> Dict[str, pd.DataFrame]:
+    """Loads the frames saved by write_cached_sections, in section order."""
+    dataframes = {}
+    for file_name in sorted(os.listdir(cache_dir)):
+        df = pd.read_parquet(os.path.join(cache_dir, file_name))
+        section_name = unquote(file_name.split("_", 1)[1].removesuffix(".parquet"))
+        # Parquet string columns store NaN as null, which reads back as None
+        dataframes[section_name] = missing_strings_as_nan(df)
+    return dataframes
+
+
+@lru_cache(maxsize=None)
+def ensure_directory(path: str) -> str:
+    """Creates a directory and its parents, once per process and path."""
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_cached_sections(cache_dir: str, dataframes: Dict[str, pd.DataFrame]) -> None:
     """
-    Validates input file name and returns the input date.
-    Tries different patterns to extract an 8-digit date from the filename.
+    Saves parsed sections as one Parquet file each. The directory is renamed
+    into place once complete, so concurrent readers never see a partial entry.
+    A failed write only skips caching.
     """
+    tmp_dir = None
+    try:
+        cache_root = os.path.dirname(cache_dir)
+        try:
+            tmp_dir = tempfile.mkdtemp(dir=ensure_directory(cache_root), suffix=".tmp")
+        except FileNotFoundError:
+            # Removed since it was first created, e.g. by a cleanup job
+            ensure_directory.cache_clear()
+            tmp_dir = tempfile.mkdtemp(dir=ensure_directory(cache_root), suffix=".tmp")
+        for index, (section_name, df) in enumerate(dataframes.items()):
+            file_name = f"{index:03d}_{quote(section_name, safe='')}.parquet"
+            df.to_parquet(os.path.join(tmp_dir, file_name), compression="zstd")
+        os.replace(tmp_dir, cache_dir)
+    except Exception as e:
+        logger.warning("Could not cache statement sections: %s", e)
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
 
-    def is_valid_date(date_str: str) -> bool:
-        return len(date_str) == 8 and date_str.isdigit()
 
-    def try_extract_date(file_name: str, pattern_func) -> str | None:
-        try:
-            date = pattern_func(file_name)
-            return date if is_valid_date(date) else None
-        except:
-            return None
+def read_section(content: bytes) -> pd.DataFrame:
+    """
+    Parses the raw CSV bytes of one statement section.
+    Uses PyArrow's multithreaded parser and falls back to the C engine for
+    sections it rejects, e.g. ragged rows from a second header inside a section,
+    or would read differently from pd.read_csv.
+    """
+    try:
+        table = pacsv.read_csv(
+            pa.BufferReader(content), convert_options=ARROW_CONVERT_OPTIONS
+        )
+    except pa.ArrowInvalid:
+        return pd.read_csv(BytesIO(content))
+
+    # read_csv renames duplicate and empty headers ("A.1", "Unnamed: 3") and
+    # keeps date and time cells as strings; leave such sections to it rather
+    # than copying its rules
+    names = table.column_names
+    if (
+        len(set(names)) < len(names)
+        or "" in names
+        or any(pa.types.is_temporal(field.type) for field in table.schema)
+    ):
+        return pd.read_csv(BytesIO(content))
 
-    # List of patterns to try
-    patterns = [
-        lambda f: f.split(".")[0].split("_")[-1],  # Daily report (basic)
-        lambda f: f.split(".")[2],  # Daily report (custom)
-        lambda f: f.split(".")[1],  # Fallback pattern
-    ]
+    # All-empty columns come back as Arrow nulls; make them float NaN columns
+    # like read_csv does
+    schema = pa.schema(
+        field.with_type(pa.float64()) if pa.types.is_null(field.type) else field
+        for field in table.schema
+    )
+    return missing_strings_as_nan(table.cast(schema).to_pandas())
 
-    for pattern in patterns:
-        date = try_extract_date(input_file, pattern)
-        if date:
-            return date
 
-    raise ValueError(f"date could not be extracted from filename: {input_file}")
+def missing_strings_as_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Marks missing cells of object columns with NaN, as read_csv does; Arrow
+    and Parquet hand them back as None.
+    """
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].to_numpy()
+        missing = pd.isna(values)
+        if missing.any():
+            values = values.copy()
+            values[missing] = np.nan
+            df[col] = values
+    return df
+
+
+# The 8-digit date is a whole "."/"_"-separated part of the file name, e.g.
+# U1234567_20250110.csv or U1234567.Daily.20250110.csv
+FILENAME_DATE_PATTERN = re.compile(r"(?<![^._])(\d{8})(?![^._])")
+
+
+@lru_cache(maxsize=1024)
+def validate_input_file(input_file: str) -> str:
+    """
+    Validates input file name and returns the input date.
+    Extracts the last 8-digit date part from the file name, so a period
+    statement such as U1234567_20250101_20250110.csv is dated by its end.
+    """
+    dates = FILENAME_DATE_PATTERN.findall(os.path.basename(input_file))
+    if not dates:
+        raise ValueError(f"date could not be extracted from filename: {input_file}")
+    return dates[-1]
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import pytest
+
+# constants reads DB_PATH on import, so point it at a scratch database first
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(), "statements.db")
+
+STATEMENT = """\
+Statement,Header,Field Name,Field Value
+Statement,Data,Period,"January 10, 2025"
+Mark-to-Market Performance Summary,Header,Asset Category,Symbol,Prior Quantity,Current Quantity,Prior Price,Current Price,Mark-to-Market P/L Position,Mark-to-Market P/L Transaction
+Mark-to-Market Performance Summary,Data,Stocks,AAPL,10,15,150.123,155.456,53.33,25
+Mark-to-Market Performance Summary,Data,Stocks,MSFT,0,5,0,410.5,0,10
+Mark-to-Market Performance Summary,Data,Total,,,,,,53.33,35
+Mark-to-Market Performance Summary,Data,Equity and Index Options,AAPL 17JAN25 200 C,-1,-2,2.5,2.75,-25,5
+Mark-to-Market Performance Summary,Data,Total,,,,,,-25,5
+Mark-to-Market Performance Summary,Data,Forex,EUR,1000,950,1,1,0,0
+Mark-to-Market Performance Summary,Data,Total (All Assets),,,,,,28.33,40
+Mark-to-Market Performance Summary,Header,Other Fees Category,Field,Amount,Description,Currency
+Mark-to-Market Performance Summary,Data,Broker Interest Paid,,-1.5,Interest,USD
+Trades,Header,DataDiscriminator,Asset Category,Currency,Symbol,Date/Time,Quantity,Proceeds
+Trades,Data,Order,Stocks,USD,AAPL,"2025-01-10, 10:00:00",5,-777.28
+Trades,Data,Order,Equity and Index Options,USD,AAPL 17JAN25 200 C,"2025-01-10, 10:05:00",-1,275
+Trades,SubTotal,,Stocks,USD,AAPL,,5,-777.28
+"""
+
+
+@pytest.fixture
+def statement() -> str:
+    """A small statement with stocks, options, forex and a fees sub-table"""
+    return STATEMENT
@@ -0,0 +1,194 @@
+import errno
+import os
+import sqlite3
+
+import pytest
+
+import app as app_module
+from app import app
+from constants import DB_PATH, SUBJECT_HEADER
+
+SUBJECT = "Daily Activity Statement 01/10/2025"
+EXPECTED_METRICS = {
+    "gross_value": pytest.approx(3834.4),
+    "nav": pytest.approx(4784.4),
+    "option_credit": -550.0,
+    "option_debit": 0.0,
+    "option_balance": -550.0,
+}
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def exported_symbols(table: str, data_date_part: str) -> list:
+    with sqlite3.connect(DB_PATH) as conn:
+        rows = conn.execute(
+            f'SELECT symbol FROM "{table}" WHERE data_date_part = ? ORDER BY symbol',
+            (data_date_part,),
+        )
+        return [symbol for (symbol,) in rows]
+
+
+def test_health(client):
+    response = client.get("/health")
+
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "healthy"
+
+
+def test_health_degraded(client, monkeypatch):
+    monkeypatch.setattr(app_module, "check_dependencies", lambda: False)
+
+    response = client.get("/health")
+
+    assert response.status_code == 503
+    body = response.get_json()
+    assert body["status"] == "degraded"
+    assert body["checks"] == {"dependencies": "failing"}
+
+
+def test_process_statement_stream(client, statement):
+    response = client.post(
+        "/process-statement-stream",
+        data=b"\xef\xbb\xbf" + statement.encode(),
+        content_type="text/csv",
+        headers={SUBJECT_HEADER: SUBJECT},
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "success"
+    assert body["data"] == EXPECTED_METRICS
+    assert exported_symbols("stocks", "2025-01-10") == ["AAPL", "MSFT"]
+
+
+def test_process_statement_stream_subject_query_param(client, statement):
+    response = client.post(
+        "/process-statement-stream?subject=Statement 01/11/2025",
+        data=statement,
+        content_type="text/csv",
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["data"] == EXPECTED_METRICS
+    assert exported_symbols("stocks", "2025-01-11") == ["AAPL", "MSFT"]
+
+
+@pytest.mark.parametrize(
+    "content_type, headers, error",
+    [
+        (
+            "application/json",
+            {SUBJECT_HEADER: SUBJECT},
+            "Content-Type must be text/csv",
+        ),
+        ("text/csv", {}, f"Missing {SUBJECT_HEADER} header"),
+        ("text/csv", {SUBJECT_HEADER: "Statement 02/30/2025"}, "Invalid date format"),
+        ("text/csv", {SUBJECT_HEADER: "Statement without date"}, "Invalid date format"),
+    ],
+    ids=["content-type", "missing-subject", "impossible-date", "no-date"],
+)
+def test_process_statement_stream_rejects(
+    client, statement, content_type, headers, error
+):
+    response = client.post(
+        "/process-statement-stream",
+        data=statement,
+        content_type=content_type,
+        headers=headers,
+    )
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert error in body["error"]
+    assert body["request_id"]
+
+
+@pytest.mark.parametrize(
+    "error, status_code, message",
+    [
+        (ValueError("no MTM section"), 400, "no MTM section"),
+        (RuntimeError("disk I/O error"), 500, "Internal server error"),
+    ],
+    ids=["invalid-statement", "unexpected"],
+)
+def test_process_statement_stream_processing_errors(
+    client, statement, monkeypatch, error, status_code, message
+):
+    def failing_process_statement(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(app_module, "process_statement", failing_process_statement)
+
+    response = client.post(
+        "/process-statement-stream",
+        data=statement,
+        content_type="text/csv",
+        headers={SUBJECT_HEADER: SUBJECT},
+    )
+
+    assert response.status_code == status_code
+    body = response.get_json()
+    assert body["error"] == message
+    assert body["request_id"]
+
+
+def test_process_statement_stream_too_large(client, statement, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", len(statement) - 1)
+
+    response = client.post(
+        "/process-statement-stream",
+        data=statement,
+        content_type="text/csv",
+        headers={SUBJECT_HEADER: SUBJECT},
+    )
+
+    assert response.status_code == 413
+    assert response.get_json()["error"] == "Request body too large"
+
+
+def test_process_statement_stream_out_of_space(client, statement, monkeypatch):
+    def posix_fallocate(fd, offset, length):
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(app_module.os, "posix_fallocate", posix_fallocate)
+
+    response = client.post(
+        "/process-statement-stream",
+        data=statement,
+        content_type="text/csv",
+        headers={SUBJECT_HEADER: SUBJECT},
+    )
+
+    assert response.status_code == 507
+    body = response.get_json()
+    assert body["error"].startswith("Could not store the upload")
+    assert body["request_id"]
+
+
+def test_process_statement_json(client, statement):
+    response = client.post(
+        "/process-statement",
+        json={"csv_content": "\ufeff" + statement, "subject": "Statement 01/12/2025"},
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "success"
+    assert body["data"] == EXPECTED_METRICS
+    assert exported_symbols("stocks", "2025-01-12") == ["AAPL", "MSFT"]
+
+
+@pytest.mark.parametrize("subject", ["Statement 02/30/2025", "Statement without date"])
+def test_process_statement_json_rejects_subject(client, statement, subject):
+    response = client.post(
+        "/process-statement", json={"csv_content": statement, "subject": subject}
+    )
+
+    assert response.status_code == 400
+    body = response.get_json()
+    assert "Invalid date format" in body["error"]
+    assert body["request_id"]
@@ -0,0 +1,112 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from utils.db_operations import DatabaseManager
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "db" / "statements.db"))
+    yield manager
+    manager.close()
+
+
+def table_rows(db_manager: DatabaseManager, table: str) -> list:
+    with sqlite3.connect(db_manager.db_path) as conn:
+        return conn.execute(f'SELECT * FROM "{table}"').fetchall()
+
+
+def table_exists(db_manager: DatabaseManager, table: str) -> bool:
+    with sqlite3.connect(db_manager.db_path) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+    return row is not None
+
+
+def test_dataframe_to_sql_creates_and_appends(db_manager):
+    df = pd.DataFrame({"symbol": ["AAPL", "MSFT"], "quantity": [1, 2.5]})
+
+    db_manager.dataframe_to_sql(df, "stocks")
+    db_manager.dataframe_to_sql(df, "stocks")
+
+    assert table_rows(db_manager, "stocks") == [("AAPL", 1.0), ("MSFT", 2.5)] * 2
+
+
+def test_missing_values_are_stored_as_null(db_manager):
+    df = pd.DataFrame({"symbol": ["AAPL", None], "quantity": [float("nan"), 2.0]})
+
+    db_manager.dataframe_to_sql(df, "stocks")
+
+    assert table_rows(db_manager, "stocks") == [("AAPL", None), (None, 2.0)]
+
+
+def test_session_commits_all_writes(db_manager):
+    with db_manager.session():
+        db_manager.dataframe_to_sql(pd.DataFrame({"a": [1]}), "first")
+        db_manager.dataframe_to_sql(pd.DataFrame({"b": ["x"]}), "second")
+
+    assert table_rows(db_manager, "first") == [(1,)]
+    assert table_rows(db_manager, "second") == [("x",)]
+
+
+def test_session_rolls_back_on_error(db_manager):
+    db_manager.dataframe_to_sql(pd.DataFrame({"a": [1]}), "existing")
+
+    with pytest.raises(RuntimeError):
+        with db_manager.session():
+            db_manager.dataframe_to_sql(pd.DataFrame({"a": [2]}), "existing")
+            # A nested session joins the outer transaction
+            with db_manager.session():
+                db_manager.dataframe_to_sql(pd.DataFrame({"b": [3]}), "created")
+            raise RuntimeError("export failed")
+
+    assert table_rows(db_manager, "existing") == [(1,)]
+    assert not table_exists(db_manager, "created")
+
+    # The rolled back CREATE TABLE is issued again on the next write
+    db_manager.dataframe_to_sql(pd.DataFrame({"b": [4]}), "created")
+    assert table_rows(db_manager, "created") == [(4,)]
+
+
+def test_failed_rollback_keeps_the_original_error(db_manager):
+    with pytest.raises(RuntimeError, match="export failed"):
+        with db_manager.session() as conn:
+            # Leaves no transaction for the session to roll back
+            conn.execute("COMMIT")
+            raise RuntimeError("export failed")
+
+    db_manager.dataframe_to_sql(pd.DataFrame({"a": [1]}), "after")
+    assert table_rows(db_manager, "after") == [(1,)]
+
+
+def test_session_reconnects_after_sqlite_error(db_manager):
+    conn = db_manager._conn
+
+    with pytest.raises(sqlite3.OperationalError):
+        with db_manager.session() as session_conn:
+            session_conn.execute("INSERT INTO missing VALUES (1)")
+
+    db_manager.dataframe_to_sql(pd.DataFrame({"a": [1]}), "after")
+    assert db_manager._conn is not conn
+    assert table_rows(db_manager, "after") == [(1,)]
+
+
+def test_session_reconnects_after_file_is_replaced(db_manager, tmp_path):
+    db_manager.dataframe_to_sql(pd.DataFrame({"a": [1]}), "stocks")
+    replacement = tmp_path / "replacement.db"
+    sqlite3.connect(replacement).close()
+    os.replace(replacement, db_manager.db_path)
+
+    db_manager.dataframe_to_sql(pd.DataFrame({"a": [2]}), "stocks")
+
+    assert table_rows(db_manager, "stocks") == [(2,)]
+
+
+def test_empty_dataframe_is_skipped(db_manager):
+    db_manager.dataframe_to_sql(pd.DataFrame({"a": []}), "empty")
+
+    assert not table_exists(db_manager, "empty")
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constants import (
+    CAP_ASSET_CATEGORY,
+    CAP_HEADER,
+    CURRENCY_COL,
+    MTM_NUMERIC_COLS,
+    MTM_SUMMARY_KEY,
+    SYMBOL_COL,
+)
+from utils.df_operations import aggregate_trades, parse_option_symbol, post_process_df
+from utils.file_operations import split_ib_statement
+
+
+def mtm_section(rows: list) -> pd.DataFrame:
+    """An MTM section as read from the statement, header column included"""
+    return pd.DataFrame(
+        rows, columns=[CAP_HEADER, CAP_ASSET_CATEGORY, "Symbol", "Prior Quantity"]
+    )
+
+
+def test_post_process_df_drops_totals_and_trailing_sub_table():
+    df = mtm_section(
+        [
+            ["Data", "Stocks", "AAPL", "10"],
+            ["Data", "Total", None, None],
+            ["Data", "Equity and Index Options", "AAPL 17JAN25 200 C", "-1"],
+            ["Data", "SubTotal", None, None],
+            ["Data", "Total (All Assets)", None, None],
+            [CAP_HEADER, "Other Fees Category", "Field", "Amount"],
+            ["Data", "Broker Interest Paid", None, "-1.5"],
+        ]
+    )
+
+    result = post_process_df(df)
+
+    assert result[CAP_ASSET_CATEGORY].tolist() == [
+        "Stocks",
+        "Equity and Index Options",
+    ]
+    assert result["Symbol"].tolist() == ["AAPL", "AAPL 17JAN25 200 C"]
+    assert result.index.tolist() == [0, 1]
+
+
+def test_post_process_df_without_repeated_header():
+    df = mtm_section(
+        [
+            ["Data", "Forex", "EUR", 1000],
+            ["Data", "total", None, None],
+        ]
+    )
+
+    result = post_process_df(df)
+
+    assert result["Symbol"].tolist() == ["EUR"]
+
+
+def test_post_process_df_converts_columns_of_a_ragged_section(tmp_path, statement):
+    path = tmp_path / "stmt.20250110.csv"
+    path.write_bytes(statement.encode())
+    # The fees sub-table is wider than the positions, so the section is read
+    # with string columns
+    df = split_ib_statement(str(path))[MTM_SUMMARY_KEY]
+    assert df["Current Quantity"].dtype == object
+
+    result = post_process_df(df)
+
+    assert result["Symbol"].tolist() == ["AAPL", "MSFT", "AAPL 17JAN25 200 C", "EUR"]
+    assert result["Current Quantity"].tolist() == [15, 5, -2, 950]
+    assert result["Prior Price"].tolist() == [150.123, 0, 2.5, 1]
+    for col in MTM_NUMERIC_COLS:
+        if col in result:
+            assert pd.api.types.is_numeric_dtype(result[col]), col
+
+
+def groupby_aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """The pandas groupby aggregate_trades replaces"""
+    return (
+        df.groupby(SYMBOL_COL, sort=True)
+        .agg(
+            currency=(CURRENCY_COL, "first"),
+            total_quantity=("quantity", "sum"),
+            total_proceeds=("proceeds", "sum"),
+        )
+        .reset_index()
+    )
+
+
+@pytest.mark.parametrize(
+    "quantity",
+    [
+        [5, -2, 1, 3, 4, 7],
+        [5.5, np.nan, 1.0, 3.25, np.nan, 7.0],
+    ],
+    ids=["int", "float"],
+)
+def test_aggregate_trades_matches_groupby(quantity):
+    trades = pd.DataFrame(
+        {
+            SYMBOL_COL: ["MSFT", "AAPL", np.nan, "MSFT", "SPY", "AAPL"],
+            CURRENCY_COL: [np.nan, "USD", "USD", "EUR", np.nan, "GBP"],
+            "quantity": quantity,
+            "proceeds": [10.0, -2.5, 99.0, np.nan, 4.0, 1.25],
+        }
+    )
+
+    result = aggregate_trades(trades)
+    expected = groupby_aggregate(trades)
+
+    assert result[SYMBOL_COL].tolist() == ["AAPL", "MSFT", "SPY"]
+    # groupby fills a symbol without any currency with NaN, aggregate_trades
+    # with None
+    assert result[CURRENCY_COL].tolist() == ["USD", "EUR", None]
+    assert expected[CURRENCY_COL].isna().tolist() == [False, False, True]
+    cols = ["total_quantity", "total_proceeds"]
+    pd.testing.assert_frame_equal(result[cols], expected[cols])
+
+
+def test_aggregate_trades_empty():
+    trades = pd.DataFrame(
+        {
+            SYMBOL_COL: pd.Series(dtype=object),
+            CURRENCY_COL: pd.Series(dtype=object),
+            "quantity": pd.Series(dtype="int64"),
+            "proceeds": pd.Series(dtype="float64"),
+        }
+    )
+
+    result = aggregate_trades(trades)
+
+    assert result.empty
+    assert result["total_quantity"].dtype == "int64"
+    assert result["total_proceeds"].dtype == "float64"
+
+
+def test_parse_option_symbol():
+    options = pd.DataFrame(
+        {SYMBOL_COL: ["AAPL 17JAN25 200 C", "BRK B 7mar26 550.5 P", "EUR.USD"]}
+    )
+
+    result = parse_option_symbol(options)
+
+    assert result["underlying"].tolist()[:2] == ["AAPL", "BRK B"]
+    # Single-digit days and lower-case months still give ISO dates
+    assert result["exp_date"].tolist()[:2] == ["2025-01-17", "2026-03-07"]
+    assert result["strike"].tolist()[:2] == [200.0, 550.5]
+    assert result["contract_type"].tolist()[:2] == ["C", "P"]
+    # A symbol that is not an option leaves every parsed column empty
+    parsed = ["underlying", "exp_date", "strike", "contract_type"]
+    assert result.loc[2, parsed].isna().all()
+    assert result[SYMBOL_COL].tolist() == options[SYMBOL_COL].tolist()
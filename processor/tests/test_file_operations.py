@@ -0,0 +1,225 @@
+import re
+import shutil
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from constants import MTM_SUMMARY_KEY, PROCESSED_SECTIONS, TRADES_KEY, UTF8_BOM
+from utils import file_operations
+from utils.file_operations import (
+    collect_sections,
+    mapped_file,
+    read_section,
+    section_line_pattern,
+    split_ib_statement,
+    validate_input_file,
+)
+
+
+def quote_section_names(statement: str) -> str:
+    """Quote the section name of every line, as some IB exports do"""
+    return re.sub(r"^([^,\n]+),", r'"\1",', statement, flags=re.MULTILINE)
+
+
+@pytest.mark.parametrize(
+    "encode",
+    [
+        lambda s: UTF8_BOM + s.encode(),
+        lambda s: s.replace("\n", "\r\n").encode(),
+        lambda s: UTF8_BOM + s.replace("\n", "\r\n").encode(),
+        lambda s: s.rstrip("\n").encode(),
+        lambda s: quote_section_names(s).encode(),
+        lambda s: UTF8_BOM + quote_section_names(s).replace("\n", "\r\n").encode(),
+    ],
+    ids=["bom", "crlf", "bom-crlf", "no-final-newline", "quoted", "bom-quoted-crlf"],
+)
+def test_statement_variants_parse_alike(tmp_path, statement, encode):
+    plain = tmp_path / "plain.20250110.csv"
+    plain.write_bytes(statement.encode())
+    variant = tmp_path / "variant.20250110.csv"
+    variant.write_bytes(encode(statement))
+
+    expected = split_ib_statement(str(plain))
+    result = split_ib_statement(str(variant))
+
+    assert list(result) == ["Statement", MTM_SUMMARY_KEY, TRADES_KEY]
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(result[name], df)
+
+
+# Headers and cells pyarrow would read differently from pd.read_csv
+ODD_SECTION = """\
+Codes,Header,Code,Code,,Date,Time,Date/Time
+Codes,Data,A,Assignment,x,2025-01-10,10:00:00,2025-01-10 10:00:00
+Codes,Data,,Exercise,,2025-01-11,11:30:00,
+"""
+
+
+def test_sections_parse_like_read_csv(statement):
+    sections = collect_sections(
+        (statement + ODD_SECTION).encode(), section_line_pattern()
+    )
+
+    assert len(sections) == 4
+    for content in map(bytes, sections.values()):
+        pd.testing.assert_frame_equal(
+            read_section(content), pd.read_csv(BytesIO(content))
+        )
+
+
+def test_include_parses_only_the_listed_sections(tmp_path, statement):
+    path = tmp_path / "stmt.20250110.csv"
+    path.write_bytes(statement.encode())
+
+    everything = split_ib_statement(str(path))
+    result = split_ib_statement(str(path), PROCESSED_SECTIONS)
+
+    assert list(result) == [MTM_SUMMARY_KEY, TRADES_KEY]
+    for name, df in result.items():
+        pd.testing.assert_frame_equal(df, everything[name])
+
+
+@pytest.mark.parametrize("prefix", [b"", UTF8_BOM], ids=["plain", "bom"])
+def test_bytes_and_path_parse_alike(tmp_path, statement, prefix):
+    path = tmp_path / "stmt.20250110.csv"
+    path.write_bytes(statement.encode())
+
+    from_path = split_ib_statement(str(path))
+    from_bytes = split_ib_statement(prefix + statement.encode())
+
+    assert list(from_bytes) == ["Statement", MTM_SUMMARY_KEY, TRADES_KEY]
+    for name, df in from_path.items():
+        pd.testing.assert_frame_equal(from_bytes[name], df)
+
+
+def test_section_columns(tmp_path, statement):
+    path = tmp_path / "stmt.20250110.csv"
+    path.write_bytes(statement.encode())
+
+    sections = split_ib_statement(str(path))
+
+    trades = sections[TRADES_KEY]
+    assert trades.columns[:3].tolist() == [
+        "Header",
+        "DataDiscriminator",
+        "Asset Category",
+    ]
+    assert trades["Header"].tolist() == ["Data", "Data", "SubTotal"]
+    assert sections["Statement"].iloc[0, -1] == "January 10, 2025"
+
+
+@pytest.mark.parametrize("content", [b"", UTF8_BOM], ids=["empty", "bom-only"])
+def test_empty_file(tmp_path, content):
+    path = tmp_path / "empty.20250110.csv"
+    path.write_bytes(content)
+
+    assert split_ib_statement(str(path)) == {}
+
+
+def test_mapped_file_skips_bom(tmp_path):
+    path = tmp_path / "stmt.20250110.csv"
+    path.write_bytes(UTF8_BOM + b"Statement,Header\n")
+
+    with mapped_file(str(path)) as data:
+        assert bytes(data) == b"Statement,Header\n"
+
+
+@pytest.mark.parametrize(
+    "file_name",
+    [
+        "U1234567_20250110.csv",
+        "U1234567.Daily.20250110.csv",
+        "/tmp/dir.with.dots/tmpabc.20250110.csv",
+        "U1234567_20250101_20250110.csv",
+    ],
+)
+def test_validate_input_file(file_name):
+    assert validate_input_file(file_name) == "20250110"
+
+
+@pytest.mark.parametrize("file_name", ["U12345678.csv", "statement_2025011.csv"])
+def test_validate_input_file_rejects(file_name):
+    with pytest.raises(ValueError):
+        validate_input_file(file_name)
+
+
+@pytest.fixture
+def section_cache(tmp_path, monkeypatch):
+    cache_root = tmp_path / "cache"
+    monkeypatch.setattr(file_operations, "SECTION_CACHE_DIR", str(cache_root))
+    return cache_root
+
+
+def cache_entries(cache_root) -> list:
+    return sorted(path.name for path in cache_root.iterdir())
+
+
+def test_section_cache_round_trip(section_cache, statement):
+    content = statement.encode()
+
+    fresh = split_ib_statement(content)
+    assert len(cache_entries(section_cache)) == 1
+    cached = split_ib_statement(content)
+
+    assert list(cached) == list(fresh)
+    for name, df in fresh.items():
+        pd.testing.assert_frame_equal(cached[name], df)
+    # The ragged MTM section is read by the C engine, with NaN in its object
+    # columns; the cached copy must keep NaN rather than None
+    symbols = cached[MTM_SUMMARY_KEY]["Symbol"]
+    assert symbols.dtype == object
+    assert symbols.iloc[2] is not None and pd.isna(symbols.iloc[2])
+
+
+def test_section_cache_hit_skips_parsing(section_cache, statement, monkeypatch):
+    content = statement.encode()
+    expected = split_ib_statement(content, PROCESSED_SECTIONS)
+
+    def fail_read_section(content):
+        raise AssertionError("cached sections were parsed again")
+
+    monkeypatch.setattr(file_operations, "read_section", fail_read_section)
+    cached = split_ib_statement(content, PROCESSED_SECTIONS)
+
+    assert list(cached) == list(expected)
+
+
+def test_section_cache_misses_on_other_content_or_sections(section_cache, statement):
+    split_ib_statement(statement.encode())
+    split_ib_statement(statement.encode(), PROCESSED_SECTIONS)
+    split_ib_statement(statement.replace("AAPL", "NVDA").encode())
+
+    assert len(cache_entries(section_cache)) == 3
+
+
+@pytest.mark.parametrize(
+    "module, name",
+    [
+        (file_operations, "SECTION_CACHE_VERSION"),
+        (pd, "__version__"),
+        (pa, "__version__"),
+    ],
+    ids=["cache-version", "pandas", "pyarrow"],
+)
+def test_section_cache_misses_on_new_versions(
+    section_cache, statement, monkeypatch, module, name
+):
+    split_ib_statement(statement.encode())
+    entries = cache_entries(section_cache)
+
+    monkeypatch.setattr(module, name, f"{getattr(module, name)}+changed")
+    split_ib_statement(statement.encode())
+
+    assert len(cache_entries(section_cache)) == 2
+    assert set(entries) < set(cache_entries(section_cache))
+
+
+def test_section_cache_recreates_removed_directory(section_cache, statement):
+    split_ib_statement(statement.encode())
+    shutil.rmtree(section_cache)
+
+    split_ib_statement(statement.encode())
+
+    assert len(cache_entries(section_cache)) == 1